@@ -26,3 +26,9 @@ class ResponseApiStatusUndocumented(Exception):
     """Недокументированный статус ответа от API."""
 
     pass
+
+
+class SendMessageError(Exception):
+    """Ошибка при отправке сообщения в Telegram чат."""
+
+    pass
@@ -1,23 +1,40 @@
+import atexit
 import logging
 import os
+import signal
 import sys
+import threading
 import time
+from collections import OrderedDict
 from http import HTTPStatus
 from logging import StreamHandler
-from typing import Callable, Dict, List, Union
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional, Tuple,
+                    Union)
 
 import exceptions
+import orjson
 import requests
-import telegram
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from tenacity import (retry, retry_if_exception, stop_after_attempt,
+                      stop_when_event_set, wait_exponential_jitter)
+from urllib3.util.retry import Retry
 
 load_dotenv()
 
+# Сведения о потоках и процессах в записи лога не используются
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+logger.setLevel(logging.INFO)
+logger.propagate = False
 handler = StreamHandler(stream=sys.stdout)
 formatter = logging.Formatter(
-    '%(asctime)s, %(funcName)s, %(lineno)s, %(levelname)s, %(message)s'
+    '%(asctime)s, %(funcName)s, %(lineno)s, %(levelname)s, %(message)s',
+    style='%',
+    validate=False
 )
 handler.setFormatter(formatter)
 logger.addHandler(handler)
@@ -27,8 +44,66 @@ TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
 RETRY_TIME = 600
+# После смены статуса API опрашивается чаще, затем интервал
+# плавно растёт до RETRY_TIME
+FAST_RETRY_TIME = 60
+RETRY_TIME_FACTOR = 1.5
+# Для скольких работ помнить последний отправленный статус
+SENT_CACHE_SIZE = 256
+# Ограничение Telegram на длину одного сообщения
+TELEGRAM_MESSAGE_LIMIT = 4096
+MESSAGE_SEPARATOR = '\n\n'
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+# Параметры запроса переиспользуются между вызовами get_api_answer
+PARAMS = {'from_date': 0}
+# Таймауты на подключение и чтение ответа, в секундах
+REQUEST_TIMEOUT = (5, 30)
+
+# Устанавливается по SIGTERM/SIGINT: прерывает ожидание между запросами
+# и паузы перед повторами запросов
+STOP = threading.Event()
+
+
+class StopAwareRetry(Retry):
+    """Повтор запроса, который прекращается после запроса на остановку."""
+
+    def is_exhausted(self) -> bool:
+        """Повторы исчерпаны или бот останавливается."""
+        return STOP.is_set() or super().is_exhausted()
+
+    def sleep(self, response=None) -> None:
+        """Пауза перед повтором, прерываемая остановкой бота."""
+        delay = None
+        if self.respect_retry_after_header and response:
+            delay = self.get_retry_after(response)
+        if delay is None:
+            delay = self.get_backoff_time()
+        STOP.wait(delay)
+
+
+# Повтор запроса с экспоненциальной задержкой при временных сбоях API
+RETRY = StopAwareRetry(
+    total=5,
+    backoff_factor=2,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(['GET', 'POST']),
+    respect_retry_after_header=True
+)
+
+# Одна сессия на всё время работы бота: соединение с API
+# переиспользуется между запросами без повторного TLS-рукопожатия
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=1, pool_maxsize=1, max_retries=RETRY
+))
+atexit.register(SESSION.close)
+
+# Последний разобранный ответ API и его ETag:
+# на ответ 304 возвращается сохранённый результат
+_LAST_ETAG = None
+_LAST_PARSED = None
 
 
 VERDICTS = {
@@ -36,6 +111,11 @@ VERDICTS = {
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+# Готовые шаблоны сообщений для каждого статуса
+TEMPLATES = {
+    status: 'Изменился статус проверки работы "{name}". ' + verdict
+    for status, verdict in VERDICTS.items()
+}
 
 # Псевдонимы типа
 DictHomework = Dict[str, Union[int, str]]
@@ -43,14 +123,50 @@ DictHomeworks = List[DictHomework]
 DictResponse = Dict[str, Union[DictHomeworks, int]]
 
 
+def _is_transient_telegram_error(error: BaseException) -> bool:
+    """Временный сбой Telegram, после которого отправку стоит повторить."""
+    from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+
+    # BadRequest в python-telegram-bot унаследован от NetworkError,
+    # но означает ошибку в самом запросе
+    if isinstance(error, BadRequest):
+        return False
+    return isinstance(error, (NetworkError, TimedOut, RetryAfter))
+
+
+_telegram_backoff = wait_exponential_jitter(initial=1, max=60)
+
+
+def _telegram_wait(retry_state) -> float:
+    """Пауза перед повтором: retry_after от сервера или backoff."""
+    retry_after = getattr(retry_state.outcome.exception(), 'retry_after', None)
+    if retry_after is not None:
+        return float(retry_after)
+    return _telegram_backoff(retry_state)
+
+
+@retry(
+    retry=retry_if_exception(_is_transient_telegram_error),
+    wait=_telegram_wait,
+    stop=stop_after_attempt(5) | stop_when_event_set(STOP),
+    sleep=STOP.wait,
+    reraise=True
+)
+def _send_with_retry(bot, message: str) -> None:
+    """Отправка сообщения с повтором при временных сбоях Telegram."""
+    bot.send_message(TELEGRAM_CHAT_ID, message)
+
+
 def send_message(bot, message: Callable[[DictHomework], str]) -> str:
     """Отправка сообщения в Telegram чат с TELEGRAM_CHAT_ID."""
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
-        logger.info('Сообщение в Telegram чат {TELEGRAM_CHAT_ID}: {message}')
+        _send_with_retry(bot, message)
+        logger.info(
+            'Сообщение в Telegram чат %s: %s', TELEGRAM_CHAT_ID, message
+        )
     except Exception as error:
-        raise telegram.error.TelegramError(f'Ошибка при отправке сообщения в '
-                                           f'Telegram чат, {error}')
+        raise exceptions.SendMessageError(f'Ошибка при отправке сообщения в '
+                                          f'Telegram чат, {error}') from error
 
 
 def get_api_answer(current_timestamp: float) -> DictResponse:
@@ -59,29 +175,49 @@ def get_api_answer(current_timestamp: float) -> DictResponse:
     В случае успешного запроса должна вернуть ответ API,
     преобразовав его из формата JSON к типам данных Python.
     """
-    timestamp = current_timestamp or int(time.time())
-    params = {'from_date': timestamp}
+    global _LAST_ETAG, _LAST_PARSED
+    PARAMS['from_date'] = current_timestamp
+    headers = {'If-None-Match': _LAST_ETAG} if _LAST_ETAG else None
     try:
-        homework_statuses = requests.get(
+        homework_statuses = SESSION.get(
             ENDPOINT,
-            headers=HEADERS,
-            params=params
+            params=PARAMS,
+            headers=headers,
+            timeout=REQUEST_TIMEOUT,
+            stream=True
         )
     except requests.exceptions.RequestException as error:
         raise exceptions.RequestAPIError(
             f'Ошибка при запросе к эндпоинту API: {error}. '
             f'Адрес эндпоинта: {ENDPOINT}; Заголовки: {HEADERS}; '
-            f'Параметры: {params}'
+            f'Параметры: {PARAMS}'
         )
-    if homework_statuses.status_code != HTTPStatus.OK:
+    # Тело ответа читается только при коде 200,
+    # иначе соединение закрывается без его загрузки
+    with homework_statuses:
         status_code = homework_statuses.status_code
-        raise exceptions.HTTPStatusError(f'Ошибка доступа к API, код ответа: '
-                                         f'{status_code}')
+        if (status_code == HTTPStatus.NOT_MODIFIED
+                and _LAST_PARSED is not None):
+            return _LAST_PARSED
+        if status_code != HTTPStatus.OK:
+            raise exceptions.HTTPStatusError(
+                f'Ошибка доступа к API, код ответа: {status_code}'
+            )
+        try:
+            content = homework_statuses.content
+        except requests.exceptions.RequestException as error:
+            raise exceptions.RequestAPIError(
+                f'Ошибка при чтении ответа API: {error}'
+            ) from error
+        etag = homework_statuses.headers.get('ETag')
     try:
-        return homework_statuses.json()
-    except exceptions.JSONParseError as error:
+        parsed = orjson.loads(content)
+    except orjson.JSONDecodeError as error:
         raise exceptions.JSONParseError(f'Ошибка при парсинге ответа '
-                                        f'из формата json: {error}')
+                                        f'из формата json: {error}') from error
+    _LAST_ETAG = etag
+    _LAST_PARSED = parsed
+    return parsed
 
 
 def check_response(response: Callable[[float], DictResponse]) -> DictHomeworks:
@@ -92,15 +228,15 @@ def check_response(response: Callable[[float], DictResponse]) -> DictHomeworks:
     то функция должна вернуть список домашних работ,
     доступный в ответе API по ключу 'homeworks'.
     """
-    if not isinstance(response, dict):
-        raise TypeError('Ответ API не словарь')
     try:
         list_works = response['homeworks']
-    except exceptions.ResponseAPIError:
+    except TypeError as error:
+        raise TypeError('Ответ API не словарь') from error
+    except KeyError as error:
         raise exceptions.ResponseAPIError(
             'Ошибка доступа. В ответе отсутствует ключ homeworks'
-        )
-    if type(list_works) is not list:
+        ) from error
+    if not isinstance(list_works, list):
         raise TypeError('Вывод по ключу homeworks не является списком')
     return list_works
 
@@ -117,49 +253,160 @@ def parse_status(homework: DictHomework) -> str:
         raise KeyError('В ответе API отсутствует ключ status')
     homework_name = homework['homework_name']
     homework_status = homework['status']
-    if homework_status not in VERDICTS:
+    template = TEMPLATES.get(homework_status)
+    if template is None:
         raise exceptions.ResponseApiStatusUndocumented(
             f'В ответа API обнаружен недокументированный статус работы:'
             f'{homework_status}'
         )
-    verdict = VERDICTS[homework_status]
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+    return template.format(name=homework_name)
+
+
+def batch_messages(
+    messages: Iterable[Tuple[DictHomework, str]]
+) -> Iterator[Tuple[DictHomeworks, str]]:
+    """Склеивает сообщения в блоки не длиннее TELEGRAM_MESSAGE_LIMIT.
+
+    Принимает пары (работа, сообщение) и возвращает пары
+    (работы блока, текст блока). Сообщения не разрываются: если
+    очередное не помещается в текущий блок, оно начинает следующий.
+    Сообщение длиннее лимита обрезается до TELEGRAM_MESSAGE_LIMIT.
+    """
+    homeworks, chunk = [], ''
+    for homework, message in messages:
+        if len(message) > TELEGRAM_MESSAGE_LIMIT:
+            message = message[:TELEGRAM_MESSAGE_LIMIT - 1] + '…'
+        if chunk and (len(chunk) + len(MESSAGE_SEPARATOR) + len(message)
+                      > TELEGRAM_MESSAGE_LIMIT):
+            yield homeworks, chunk
+            homeworks, chunk = [], ''
+        chunk = f'{chunk}{MESSAGE_SEPARATOR}{message}' if chunk else message
+        homeworks.append(homework)
+    if chunk:
+        yield homeworks, chunk
+
+
+def _parse_new_statuses(
+    homeworks: DictHomeworks, sent: OrderedDict
+) -> Tuple[List[Tuple[DictHomework, str]], List[str]]:
+    """Сообщения о работах, статус которых изменился с прошлой отправки.
+
+    Работа с недокументированным статусом или без нужных ключей
+    пропускается, чтобы не блокировать отправку остальных;
+    описания таких ошибок возвращаются вторым элементом.
+    """
+    messages, errors = [], []
+    for homework in homeworks:
+        if ('status' in homework
+                and sent.get(homework.get('homework_name'))
+                == homework['status']):
+            continue
+        try:
+            messages.append((homework, parse_status(homework)))
+        except (KeyError, exceptions.ResponseApiStatusUndocumented) as error:
+            logger.error('Статус работы не отправлен: %s', error)
+            errors.append(str(error))
+    return messages, errors
+
+
+def send_new_statuses(bot, homeworks: DictHomeworks,
+                      sent: OrderedDict) -> bool:
+    """Отправка статусов работ, изменившихся с последней отправки.
+
+    В sent хранится последний отправленный статус каждой работы:
+    повтор того же статуса пропускается, возврат к прежнему — нет.
+    Возвращает True, если был отправлен хотя бы один статус.
+    Если часть работ разобрать не удалось, после отправки остальных
+    выбрасывается ResponseAPIError.
+    """
+    messages, errors = _parse_new_statuses(homeworks, sent)
+    if not messages and not errors:
+        logger.info('В ответе отсутствуют новые статусы работ')
+        return False
+    for chunk_homeworks, message in batch_messages(messages):
+        send_message(bot, message)
+        for homework in chunk_homeworks:
+            homework_name = homework['homework_name']
+            sent[homework_name] = homework['status']
+            sent.move_to_end(homework_name)
+    while len(sent) > SENT_CACHE_SIZE:
+        sent.popitem(last=False)
+    if errors:
+        raise exceptions.ResponseAPIError(
+            f'Статусы работ не отправлены: {"; ".join(errors)}'
+        )
+    return bool(messages)
+
+
+def next_delay(delay: float, status_sent: Optional[bool]) -> float:
+    """Пауза до следующего запроса к API.
+
+    После отправки нового статуса — FAST_RETRY_TIME, иначе пауза
+    растёт в RETRY_TIME_FACTOR раз до RETRY_TIME. status_sent
+    равен None, если запрос завершился ошибкой: тогда RETRY_TIME.
+    """
+    if status_sent is None:
+        return RETRY_TIME
+    if status_sent:
+        return FAST_RETRY_TIME
+    return min(delay * RETRY_TIME_FACTOR, RETRY_TIME)
 
 
 def check_tokens() -> bool:
     """Проверка доступности необходимых переменных окружения."""
-    env_variables = [PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID]
-    if all(env_variables):
+    tokens_ok = all((PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID))
+    if tokens_ok:
         logger.info('Все обязательные переменные окружения обнаружены')
-        return True
-    logger.critical('Отсутствуют обязательные переменные окружения!')
-    return False
+    else:
+        logger.critical('Отсутствуют обязательные переменные окружения!')
+    return tokens_ok
+
+
+def stop_handler(signum, frame) -> None:
+    """Запрос на остановку бота по сигналу.
+
+    Повторы запросов после этого прекращаются. Повторный сигнал
+    обрабатывается по умолчанию и завершает бота сразу.
+    """
+    STOP.set()
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
 
 
 def main() -> None:
     """Основная логика работы бота."""
     if not check_tokens():
-        raise Exception('Отсутствуют обязательные переменные окружения!')
+        sys.exit(1)
+    # Библиотека telegram тяжёлая, импортируется только при запуске бота
+    import telegram
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
+    signal.signal(signal.SIGTERM, stop_handler)
+    signal.signal(signal.SIGINT, stop_handler)
     current_timestamp = int(time.time())
     previous_error = None
+    sent = OrderedDict()
+    delay = RETRY_TIME
     while True:
         try:
             response = get_api_answer(current_timestamp)
             homeworks = check_response(response)
-            if homeworks:
-                send_message(bot, parse_status(homeworks[0]))
-            else:
-                logger.info('В ответе отсутствуют новые статусы работ')
-            current_timestamp = response.get('current_date')
-            time.sleep(RETRY_TIME)
+            status_sent = send_new_statuses(bot, homeworks, sent)
+            delay = next_delay(delay, status_sent)
+            current_timestamp = response.get(
+                'current_date', current_timestamp
+            )
         except Exception as error:
+            if STOP.is_set():
+                break
+            delay = next_delay(delay, None)
             now_error = f'Сбой в работе программы: {error}'
             logger.error(now_error)
             if previous_error != now_error:
                 previous_error = now_error
                 send_message(bot, now_error)
-            time.sleep(RETRY_TIME)
+        if STOP.wait(delay):
+            break
+    logger.info('Бот остановлен')
 
 
 if __name__ == '__main__':
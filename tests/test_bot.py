@@ -1,7 +1,11 @@
+import json
 import os
+import signal
+import threading
+from collections import OrderedDict
 from http import HTTPStatus
 
-import requests
+import exceptions
 import telegram
 import utils
 
@@ -18,18 +22,6 @@ class MockResponseGET:
             'Проверьте, что вы делаете запрос на правильный '
             'ресурс API для запроса статуса домашней работы'
         )
-        assert 'headers' in kwargs, (
-            'Проверьте, что вы передали заголовки `headers` для запроса '
-            'статуса домашней работы'
-        )
-        assert 'Authorization' in kwargs['headers'], (
-            'Проверьте, что в параметры `headers` для запроса статуса '
-            'домашней работы добавили Authorization'
-        )
-        assert kwargs['headers']['Authorization'].startswith('OAuth '), (
-            'Проверьте, что в параметрах `headers` для запроса статуса '
-            'домашней работы Authorization начинается с OAuth'
-        )
         assert params is not None, (
             'Проверьте, что передали параметры `params` для запроса '
             'статуса домашней работы'
@@ -44,6 +36,16 @@ class MockResponseGET:
         )
         self.random_timestamp = random_timestamp
         self.status_code = http_status
+        self.headers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.closed = True
 
     def json(self):
         data = {
@@ -52,6 +54,10 @@ class MockResponseGET:
         }
         return data
 
+    @property
+    def content(self):
+        return json.dumps(self.json()).encode()
+
 
 class MockTelegramBot:
 
@@ -178,6 +184,60 @@ class TestHomework:
         import homework
         utils.check_function(homework, 'send_message', 2)
 
+    def test_send_message_permanent_error(self):
+        class FailingBot:
+            calls = 0
+
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                FailingBot.calls += 1
+                raise telegram.error.BadRequest('Chat not found')
+
+        import homework
+
+        try:
+            homework.send_message(FailingBot(), 'text')
+        except exceptions.SendMessageError:
+            pass
+        else:
+            assert False, (
+                'Убедитесь, что `send_message` выбрасывает SendMessageError '
+                'при ошибке отправки'
+            )
+        assert FailingBot.calls == 1, (
+            'Убедитесь, что `send_message` не повторяет отправку '
+            'при постоянной ошибке Telegram'
+        )
+
+    def test_send_message_retry_after(self):
+        class FloodBot:
+            calls = 0
+
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                FloodBot.calls += 1
+                if FloodBot.calls == 1:
+                    raise telegram.error.RetryAfter(0)
+
+        import homework
+
+        homework.send_message(FloodBot(), 'text')
+        assert FloodBot.calls == 2, (
+            'Убедитесь, что `send_message` повторяет отправку '
+            'после RetryAfter от Telegram'
+        )
+
+    def test_session_headers(self):
+        import homework
+
+        headers = homework.SESSION.headers
+        assert 'Authorization' in headers, (
+            'Проверьте, что в заголовки сессии для запроса статуса '
+            'домашней работы добавили Authorization'
+        )
+        assert headers['Authorization'].startswith('OAuth '), (
+            'Проверьте, что в заголовках сессии для запроса статуса '
+            'домашней работы Authorization начинается с OAuth'
+        )
+
     def test_get_api_answers(self, monkeypatch, random_timestamp,
                              current_timestamp, api_url):
         def mock_response_get(*args, **kwargs):
@@ -186,10 +246,10 @@ class TestHomework:
                 current_timestamp=current_timestamp, **kwargs
             )
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'get_api_answer'
         utils.check_function(homework, func_name, 1)
 
@@ -215,8 +275,45 @@ class TestHomework:
             'ключа `current_date`'
         )
 
+    def test_get_api_answer_not_modified(self, monkeypatch, random_timestamp,
+                                         current_timestamp, api_url):
+        etag = '"abc"'
+        requests_headers = []
+
+        def mock_response_get(*args, **kwargs):
+            requests_headers.append(kwargs.get('headers'))
+            response = MockResponseGET(
+                *args, random_timestamp=random_timestamp,
+                current_timestamp=current_timestamp, **kwargs
+            )
+            if len(requests_headers) == 1:
+                response.headers = {'ETag': etag}
+            else:
+                response.status_code = HTTPStatus.NOT_MODIFIED
+            return response
+
+        import homework
+
+        monkeypatch.setattr(homework, '_LAST_ETAG', None)
+        monkeypatch.setattr(homework, '_LAST_PARSED', None)
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
+        first = homework.get_api_answer(current_timestamp)
+        second = homework.get_api_answer(current_timestamp)
+        assert requests_headers[1] == {'If-None-Match': etag}, (
+            'Проверьте, что функция `get_api_answer` передаёт ETag '
+            'прошлого ответа в заголовке If-None-Match'
+        )
+        assert second is first, (
+            'Проверьте, что функция `get_api_answer` при ответе 304 '
+            'возвращает сохранённый результат'
+        )
+
     def test_get_500_api_answer(self, monkeypatch, random_timestamp,
                                 current_timestamp, api_url):
+        body_reads = []
+        responses = []
+
         def mock_500_response_get(*args, **kwargs):
             response = MockResponseGET(
                 *args, random_timestamp=random_timestamp,
@@ -225,17 +322,19 @@ class TestHomework:
             )
 
             def json_invalid():
+                body_reads.append(response)
                 data = {
                 }
                 return data
 
             response.json = json_invalid
+            responses.append(response)
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_500_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_500_response_get)
+
         func_name = 'get_api_answer'
         try:
             homework.get_api_answer(current_timestamp)
@@ -246,6 +345,14 @@ class TestHomework:
                 f'Убедитесь, что в функции `{func_name}` обрабатываете ситуацию, '
                 'когда API возвращает код, отличный от 200'
             )
+        assert not body_reads, (
+            f'Убедитесь, что функция `{func_name}` не читает тело ответа, '
+            'когда API возвращает код, отличный от 200'
+        )
+        assert all(getattr(r, 'closed', False) for r in responses), (
+            f'Убедитесь, что функция `{func_name}` закрывает ответ, '
+            'когда API возвращает код, отличный от 200'
+        )
 
     def test_parse_status(self, random_timestamp):
         test_data = {
@@ -291,6 +398,172 @@ class TestHomework:
             f'`{status}` в возврате функции parse_status()'
         )
 
+    def test_batch_messages(self):
+        import homework
+
+        func_name = 'batch_messages'
+        utils.check_function(homework, func_name, 1)
+
+        messages = [(1, 'a' * 3000), (2, 'b' * 1000), (3, 'c' * 100)]
+        chunks = list(homework.batch_messages(iter(messages)))
+        assert chunks == [
+            ([1, 2], 'a' * 3000 + '\n\n' + 'b' * 1000),
+            ([3], 'c' * 100),
+        ], (
+            f'Проверьте, что функция `{func_name}` склеивает сообщения '
+            'через пустую строку, не превышая лимит длины Telegram, '
+            'и возвращает работы каждого блока'
+        )
+        limit = homework.TELEGRAM_MESSAGE_LIMIT
+        chunks = list(homework.batch_messages([(1, 'a'), (2, 'b' * 5000)]))
+        assert [homeworks for homeworks, _ in chunks] == [[1], [2]], (
+            f'Проверьте, что функция `{func_name}` отправляет слишком '
+            'длинное сообщение отдельным блоком'
+        )
+        assert all(len(chunk) <= limit for _, chunk in chunks), (
+            f'Проверьте, что функция `{func_name}` обрезает сообщение '
+            'длиннее лимита Telegram'
+        )
+        assert list(homework.batch_messages([])) == [], (
+            f'Проверьте, что функция `{func_name}` ничего не возвращает '
+            'для пустого списка сообщений'
+        )
+
+    def test_send_new_statuses(self, monkeypatch, random_timestamp):
+        bot = MockTelegramBot(token='1234:abcdefg',
+                              random_timestamp=random_timestamp)
+        messages = []
+
+        def mock_send_message(bot, message):
+            messages.append(message)
+
+        import homework
+
+        func_name = 'send_new_statuses'
+        utils.check_function(homework, func_name, 3)
+        monkeypatch.setattr(homework, 'send_message', mock_send_message)
+
+        sent = OrderedDict()
+        results = [
+            homework.send_new_statuses(
+                bot, [{'homework_name': 'hw123', 'status': status}], sent
+            )
+            for status in ('reviewing', 'reviewing', 'rejected',
+                           'reviewing', 'rejected', 'approved')
+        ]
+        assert results == [True, False, True, True, True, True], (
+            f'Убедитесь, что функция `{func_name}` возвращает True, '
+            'только если был отправлен новый статус'
+        )
+        assert len(messages) == 5, (
+            f'Убедитесь, что функция `{func_name}` пропускает только '
+            'повтор статуса, не изменившегося с прошлой отправки'
+        )
+        assert messages[-1].endswith(self.HOMEWORK_STATUSES['approved']), (
+            f'Убедитесь, что функция `{func_name}` отправляет '
+            'последний статус работы'
+        )
+
+    def test_send_new_statuses_undocumented(self, monkeypatch,
+                                            random_timestamp):
+        bot = MockTelegramBot(token='1234:abcdefg',
+                              random_timestamp=random_timestamp)
+        messages = []
+
+        def mock_send_message(bot, message):
+            messages.append(message)
+
+        import homework
+
+        func_name = 'send_new_statuses'
+        monkeypatch.setattr(homework, 'send_message', mock_send_message)
+        logged_errors = []
+        monkeypatch.setattr(
+            homework.logger, 'error',
+            lambda *args, **kwargs: logged_errors.append(args)
+        )
+
+        sent = OrderedDict()
+        try:
+            homework.send_new_statuses(bot, [
+                {'homework_name': 'hw1', 'status': 'unknown'},
+                {'homework_name': 'hw3', 'lesson_name': 'Итоговый проект'},
+                {'homework_name': 'hw2', 'status': 'approved'},
+            ], sent)
+        except exceptions.ResponseAPIError as error:
+            assert 'unknown' in str(error) and 'status' in str(error), (
+                f'Убедитесь, что функция `{func_name}` описывает в ошибке '
+                'все работы, статус которых не отправлен'
+            )
+        else:
+            assert False, (
+                f'Убедитесь, что функция `{func_name}` после отправки '
+                'остальных статусов выбрасывает ошибку о пропущенных работах'
+            )
+        assert len(messages) == 1 and 'hw2' in messages[0], (
+            f'Убедитесь, что функция `{func_name}` отправляет статусы '
+            'остальных работ, если у одной статус недокументирован'
+        )
+        assert len(logged_errors) == 2, (
+            f'Убедитесь, что функция `{func_name}` логирует работы '
+            'с недокументированным статусом и без ключа status'
+        )
+        assert sent == {'hw2': 'approved'}, (
+            f'Убедитесь, что функция `{func_name}` запоминает только '
+            'отправленные статусы'
+        )
+
+    def test_send_new_statuses_failed_chunk(self, monkeypatch,
+                                            random_timestamp):
+        bot = MockTelegramBot(token='1234:abcdefg',
+                              random_timestamp=random_timestamp)
+        messages = []
+
+        def mock_send_message(bot, message):
+            if messages:
+                raise exceptions.SendMessageError('Ошибка отправки')
+            messages.append(message)
+
+        import homework
+
+        func_name = 'send_new_statuses'
+        monkeypatch.setattr(homework, 'send_message', mock_send_message)
+
+        sent = OrderedDict()
+        name_length = homework.TELEGRAM_MESSAGE_LIMIT // 2
+        homeworks = [
+            {'homework_name': 'a' * name_length, 'status': 'approved'},
+            {'homework_name': 'b' * name_length, 'status': 'approved'},
+        ]
+        try:
+            homework.send_new_statuses(bot, homeworks, sent)
+        except exceptions.SendMessageError:
+            pass
+        assert sent == {'a' * name_length: 'approved'}, (
+            f'Убедитесь, что функция `{func_name}` запоминает работы '
+            'из каждого блока сразу после его отправки'
+        )
+
+    def test_next_delay(self):
+        import homework
+
+        func_name = 'next_delay'
+        utils.check_function(homework, func_name, 2)
+
+        delay = homework.next_delay(homework.RETRY_TIME, True)
+        delays = [delay]
+        while delay < homework.RETRY_TIME:
+            delay = homework.next_delay(delay, False)
+            delays.append(delay)
+        assert delays == [60, 90, 135, 202.5, 303.75, 455.625, 600], (
+            f'Проверьте, что функция `{func_name}` после смены статуса '
+            'сокращает паузу и затем плавно увеличивает её до RETRY_TIME'
+        )
+        assert homework.next_delay(60, None) == homework.RETRY_TIME, (
+            f'Проверьте, что функция `{func_name}` после ошибки '
+            'возвращает паузу RETRY_TIME'
+        )
+
     def test_check_response(self, monkeypatch, random_timestamp,
                             current_timestamp, api_url):
         def mock_response_get(*args, **kwargs):
@@ -315,10 +588,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'check_response'
         response = homework.get_api_answer(current_timestamp)
         status = homework.check_response(response)
@@ -352,10 +625,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'parse_status'
         response = homework.get_api_answer(current_timestamp)
         homeworks = homework.check_response(response)
@@ -400,10 +673,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'parse_status'
         response = homework.get_api_answer(current_timestamp)
         homeworks = homework.check_response(response)
@@ -448,10 +721,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'parse_status'
         response = homework.get_api_answer(current_timestamp)
         homeworks = homework.check_response(response)
@@ -484,15 +757,15 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_no_homeworks_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_no_homeworks_response_get)
+
         func_name = 'check_response'
         result = homework.get_api_answer(current_timestamp)
         try:
             homework.check_response(result)
-        except:
+        except exceptions.ResponseAPIError:
             pass
         else:
             assert False, (
@@ -525,10 +798,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'check_response'
         response = homework.get_api_answer(current_timestamp)
         try:
@@ -565,10 +838,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'check_response'
         response = homework.get_api_answer(current_timestamp)
         try:
@@ -599,10 +872,10 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_empty_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_empty_response_get)
+
         func_name = 'check_response'
         result = homework.get_api_answer(current_timestamp)
         try:
@@ -626,10 +899,10 @@ class TestHomework:
             )
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'check_response'
         try:
             homework.get_api_answer(current_timestamp)
@@ -640,3 +913,71 @@ class TestHomework:
                 f'Убедитесь, что в функции `{func_name}` обрабатываете ситуацию, '
                 'когда API возвращает код, отличный от 200'
             )
+
+    def test_main_stops_on_stop_event(self, monkeypatch, random_timestamp):
+        def mock_telegram_bot(*args, **kwargs):
+            return MockTelegramBot(*args, random_timestamp=random_timestamp, **kwargs)
+
+        monkeypatch.setattr(telegram, 'Bot', mock_telegram_bot)
+        monkeypatch.setattr(signal, 'signal', lambda *args: None)
+
+        import homework
+
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'sometoken')
+        monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', '1234:abcdefg')
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', 12345)
+        monkeypatch.setattr(homework, 'get_api_answer', lambda timestamp: {
+            'homeworks': [], 'current_date': random_timestamp
+        })
+        stop = threading.Event()
+        stop.set()
+        monkeypatch.setattr(homework, 'STOP', stop)
+
+        thread = threading.Thread(target=homework.main, daemon=True)
+        thread.start()
+        thread.join(timeout=5)
+        assert not thread.is_alive(), (
+            'Убедитесь, что `main` завершает работу, '
+            'когда установлено событие STOP'
+        )
+
+    def test_retry_exhausted_on_stop(self, monkeypatch):
+        import homework
+
+        stop = threading.Event()
+        monkeypatch.setattr(homework, 'STOP', stop)
+        assert not homework.RETRY.is_exhausted(), (
+            'Убедитесь, что запрос к API повторяется при временных сбоях'
+        )
+        stop.set()
+        assert homework.RETRY.is_exhausted(), (
+            'Убедитесь, что запрос к API не повторяется '
+            'после запроса на остановку бота'
+        )
+
+    def test_stop_handler(self, monkeypatch):
+        registered = []
+        monkeypatch.setattr(
+            signal, 'signal',
+            lambda signum, handler: registered.append((signum, handler))
+        )
+
+        import homework
+
+        stop = threading.Event()
+        monkeypatch.setattr(homework, 'STOP', stop)
+
+        func_name = 'stop_handler'
+        utils.check_function(homework, func_name, 2)
+        homework.stop_handler(signal.SIGTERM, None)
+        assert stop.is_set(), (
+            f'Убедитесь, что функция `{func_name}` устанавливает STOP'
+        )
+        assert (signal.SIGINT, signal.default_int_handler) in registered, (
+            f'Убедитесь, что функция `{func_name}` восстанавливает '
+            'обработчик SIGINT по умолчанию'
+        )
+        assert (signal.SIGTERM, signal.SIG_DFL) in registered, (
+            f'Убедитесь, что функция `{func_name}` восстанавливает '
+            'обработчик SIGTERM по умолчанию'
+        )